@@ -18,9 +18,13 @@
 # Boston, MA 02111-1307, USA.
 #
 
+import contextlib
 import errno
+import gc
 import glob
 import hashlib
+import io
+import mmap
 import os
 import shutil
 import sys
@@ -45,11 +49,27 @@ def _get_versionhash():
     return hashlib.sha1(''.join(mtimes).encode('ascii')).hexdigest()
 
 
+@contextlib.contextmanager
+def _gc_disabled():
+    # (Un)pickling a large object graph allocates lots of container
+    # objects at once, which would trigger several pointless collections.
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
 class CacheStore(object):
 
     def __init__(self):
         self._directory = self._get_cachedir()
         self._check_cache_version()
+        self._store_filenames = {}
+        self._stored_this_session = set()
+        self._pickle_buf = io.BytesIO()
 
     def _get_cachedir(self):
         if 'GI_SCANNER_DISABLE_CACHE' in os.environ:
@@ -100,18 +120,25 @@ class CacheStore(object):
         # the cache all together.
         if self._directory is None:
             return
+        try:
+            return self._store_filenames[filename]
+        except KeyError:
+            pass
         # Assume UTF-8 encoding for the filenames. This doesn't matter so much
         # as long as the results of this method always produce the same hash.
-        hexdigest = hashlib.sha1(filename.encode('utf-8')).hexdigest()
-        return os.path.join(self._directory, hexdigest)
-
-    def _cache_is_valid(self, store_filename, filename):
-        try:
-            store_mtime = os.stat(store_filename).st_mtime
-        except FileNotFoundError:
-            return False
+        # Filenames which are already bytes are used as-is.
+        if isinstance(filename, bytes):
+            encoded = filename
+        else:
+            encoded = filename.encode('utf-8')
+        # This is just a key, so use the cheaper BLAKE2 instead of SHA-1.
+        hexdigest = hashlib.blake2b(encoded, digest_size=16).hexdigest()
+        store_filename = os.path.join(self._directory, hexdigest)
+        self._store_filenames[filename] = store_filename
+        return store_filename
 
-        return store_mtime >= os.stat(filename).st_mtime
+    def _cache_is_valid(self, store_stat, filename):
+        return store_stat.st_mtime >= os.stat(filename).st_mtime
 
     def _remove_filename(self, filename):
         try:
@@ -130,53 +157,89 @@ class CacheStore(object):
             self._remove_filename(os.path.join(self._directory, filename))
 
     def store(self, filename, data):
-        store_filename = self._get_filename(filename)
-        if store_filename is None:
-            return
+        self.store_at(self._get_filename(filename), data)
 
-        if self._cache_is_valid(store_filename, filename):
-            return None
+    def store_at(self, store_filename, data):
+        # Stores data in an entry as returned by load_or_path(). This is
+        # only called after loading missed, so the entry is either absent
+        # or stale; no need to check its mtime again.
+        if store_filename is None or store_filename in self._stored_this_session:
+            return
 
-        tmp_fd, tmp_filename = tempfile.mkstemp(prefix='g-ir-scanner-cache-')
+        # The cached data is a full GIRParser object graph (AST nodes
+        # with back references), which only pickle can represent;
+        # schema-less formats like msgpack or JSON cannot.
+        # Serialize into a reused in-memory buffer first, so that the
+        # entry gets written with a single large write().
+        buf = self._pickle_buf
+        buf.seek(0)
+        buf.truncate()
+        with _gc_disabled():
+            pickle.dump(data, buf, pickle.HIGHEST_PROTOCOL)
+
+        # Create the temporary file next to the entry so that it can be
+        # atomically renamed into place below.
         try:
-            with os.fdopen(tmp_fd, 'wb') as tmp_file:
-                pickle.dump(data, tmp_file)
+            tmp_fd, tmp_filename = tempfile.mkstemp(prefix='g-ir-scanner-cache-',
+                                                    dir=self._directory)
         except (IOError, OSError) as e:
-            # No space left on device
-            if e.errno == errno.ENOSPC:
-                self._remove_filename(tmp_filename)
+            # Permission denied
+            if e.errno == errno.EACCES:
                 return
             else:
                 raise
 
         try:
-            shutil.move(tmp_filename, store_filename)
+            with os.fdopen(tmp_fd, 'wb') as tmp_file, buf.getbuffer() as view:
+                tmp_file.write(view)
+            os.replace(tmp_filename, store_filename)
         except (IOError, OSError) as e:
-            # Permission denied
-            if e.errno == errno.EACCES:
-                self._remove_filename(tmp_filename)
+            self._remove_filename(tmp_filename)
+            # No space left on device, permission denied
+            if e.errno in (errno.ENOSPC, errno.EACCES):
+                return
             else:
                 raise
+        except BaseException:
+            self._remove_filename(tmp_filename)
+            raise
+
+        self._stored_this_session.add(store_filename)
 
     def load(self, filename):
+        data, store_filename = self.load_or_path(filename)
+        return data
+
+    def load_or_path(self, filename):
+        # Returns the cached data (or None) together with the entry it
+        # was looked up in, which can be passed to store_at() on a miss.
         store_filename = self._get_filename(filename)
         if store_filename is None:
-            return
+            return None, None
         try:
             fd = open(store_filename, 'rb')
         except (IOError, OSError) as e:
             if e.errno == errno.ENOENT:
-                return None
+                return None, store_filename
             else:
                 raise
 
         with fd:
-            if not self._cache_is_valid(store_filename, filename):
-                return None
+            # We already have the entry open, so don't look it up again
+            store_stat = os.fstat(fd.fileno())
+            if not self._cache_is_valid(store_stat, filename):
+                return None, store_filename
             try:
-                data = pickle.load(fd)
+                with _gc_disabled():
+                    # Unpickle straight from the page cache, unless the
+                    # entry is so small that mapping it costs more.
+                    if store_stat.st_size >= mmap.PAGESIZE:
+                        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                            data = pickle.loads(buf)
+                    else:
+                        data = pickle.load(fd)
             except Exception:
                 # Broken cache entry, remove it
                 self._remove_filename(store_filename)
                 data = None
-            return data
+            return data, store_filename
@@ -18,7 +18,9 @@
 # Boston, MA 02111-1307, USA.
 #
 
+import concurrent.futures
 import os
+import re
 import shlex
 import subprocess
 import tempfile
@@ -26,9 +28,7 @@ import tempfile
 import sys
 import distutils
 
-from distutils.msvccompiler import MSVCCompiler
 from distutils.unixccompiler import UnixCCompiler
-from distutils.cygwinccompiler import Mingw32CCompiler
 from distutils.sysconfig import get_config_vars
 from distutils.sysconfig import customize_compiler as orig_customize_compiler
 
@@ -98,12 +98,17 @@ def customize_compiler(compiler):
 # Flags that retain macros in preprocessed output.
 FLAGS_RETAINING_MACROS = ['-g3', '-ggdb3', '-gstabs3', '-gcoff3', '-gxcoff3', '-gvms3']
 
+# Symbol in the output of "dumpbin -symbols" naming the DLL an import
+# library links to
+_IMPORT_DESCRIPTOR_RE = re.compile(r'(?<!\S)__IMPORT_DESCRIPTOR_(\S+)')
+
 
 class CCompiler(object):
 
     compiler_cmd = ''
     compiler = None
     _cflags_no_deprecation_warnings = ''
+    _compiler_libsearch = None
 
     def __init__(self,
                  environ=os.environ,
@@ -140,11 +145,23 @@ class CCompiler(object):
             self.compiler = distutils.ccompiler.new_compiler(compiler=compiler_name)
         customize_compiler(self.compiler)
 
+        # The compiler instance never changes, so check this only once.
+        # Only Windows can end up with the MSVC or MinGW compiler classes,
+        # so don't import their modules elsewhere.
+        if osname == 'nt':
+            from distutils.msvccompiler import MSVCCompiler
+            from distutils.cygwinccompiler import Mingw32CCompiler
+            self._is_msvc = isinstance(self.compiler, MSVCCompiler)
+            is_mingw = isinstance(self.compiler, Mingw32CCompiler)
+        else:
+            self._is_msvc = False
+            is_mingw = False
+
         # customize_compiler() from distutils only does customization
         # for 'unix' compiler type.  Also, avoid linking to msvcrxx.dll
         # for MinGW builds as the dumper binary does not link to the
         # Python DLL, but link to msvcrt.dll if necessary.
-        if isinstance(self.compiler, Mingw32CCompiler):
+        if is_mingw:
             if self.compiler.dll_libraries != ['msvcrt']:
                 self.compiler.dll_libraries = []
             if self.compiler.preprocessor is None:
@@ -169,13 +186,16 @@ class CCompiler(object):
                 self.compiler_cmd = 'cl.exe'
                 self._cflags_no_deprecation_warnings = "-wd4996"
         else:
-            if (isinstance(self.compiler, Mingw32CCompiler)):
+            if is_mingw:
                 self.compiler_cmd = self.compiler.compiler[0]
             else:
                 self.compiler_cmd = ' '.join(self.compiler.compiler)
 
             self._cflags_no_deprecation_warnings = "-Wno-deprecated-declarations"
 
+        # Cache of directory listings used by resolve_windows_libs()
+        self._dir_entries = {}
+
     def get_internal_link_flags(self, args, libtool, libraries, extra_libraries, libpaths, lib_dirs_envvar):
         # An "internal" link is where the library to be introspected
         # is being built in the current directory.
@@ -200,13 +220,18 @@ class CCompiler(object):
                 if sys.platform != 'darwin':
                     args.append('-Wl,--no-as-needed')
 
-        for library_path in libpaths:
-            # The dumper program needs to look for dynamic libraries
-            # in the library paths first
-            if self.check_is_msvc():
-                library_path = library_path.replace('/', '\\')
-                args.append('-libpath:' + library_path)
-            else:
+        # The dumper program needs to look for dynamic libraries
+        # in the library paths first
+        if self._is_msvc:
+            runtime_paths = [library_path.replace('/', '\\') for library_path in libpaths]
+            args.extend('-libpath:' + library_path for library_path in runtime_paths)
+
+            # Note that Visual Studio builds do not use libtool!
+            args.extend(library + '.lib'
+                        for library in libraries + extra_libraries
+                        if library != 'm')
+        else:
+            for library_path in libpaths:
                 args.append('-L' + library_path)
                 if os.path.isabs(library_path):
                     if libtool:
@@ -214,43 +239,34 @@ class CCompiler(object):
                         args.append(library_path)
                     else:
                         args.append('-Wl,-rpath,' + library_path)
+                runtime_paths.append(library_path)
 
-            runtime_paths.append(library_path)
-
-        for library in libraries + extra_libraries:
-            if self.check_is_msvc():
-                # Note that Visual Studio builds do not use libtool!
-                if library != 'm':
-                    args.append(library + '.lib')
-            else:
-                # If we get a real filename, just use it as-is
-                if library.endswith(".la") or os.path.isfile(library):
-                    args.append(library)
-                else:
-                    args.append('-l' + library)
+            # If we get a real filename, just use it as-is
+            args.extend(library
+                        if library.endswith(".la") or os.path.isfile(library)
+                        else '-l' + library
+                        for library in libraries + extra_libraries)
 
+        runtime_path = os.pathsep.join(runtime_paths)
         for envvar in runtime_path_envvar:
-            if envvar in os.environ:
-                os.environ[envvar] = \
-                    os.pathsep.join(runtime_paths + [os.environ[envvar]])
-            else:
-                os.environ[envvar] = os.pathsep.join(runtime_paths)
+            old_value = os.environ.get(envvar)
+            if old_value is None:
+                os.environ[envvar] = runtime_path
+            elif runtime_paths:
+                os.environ[envvar] = runtime_path + os.pathsep + old_value
 
     def get_external_link_flags(self, args, libraries):
         # An "external" link is where the library to be introspected
         # is installed on the system; this case is used for the scanning
         # of GLib in gobject-introspection itself.
 
-        for library in libraries:
-            if self.check_is_msvc():
-                # Visual Studio: don't attempt to link to m.lib
-                if library != 'm':
-                    args.append(library + ".lib")
-            else:
-                if library.endswith(".la"):  # explicitly specified libtool library
-                    args.append(library)
-                else:
-                    args.append('-l' + library)
+        if self._is_msvc:
+            # Visual Studio: don't attempt to link to m.lib
+            args.extend(library + ".lib" for library in libraries if library != 'm')
+        else:
+            # Use explicitly specified libtool libraries as-is
+            args.extend(library if library.endswith(".la") else '-l' + library
+                        for library in libraries)
 
     def preprocess(self, source, output, cpp_options):
         extra_postargs = ['-C']
@@ -345,70 +361,35 @@ class CCompiler(object):
                 args.extend(libtool)
                 args.append('--mode=execute')
             args.extend([os.environ.get('DLLTOOL', 'dlltool.exe'), '--identify'])
-            proc = subprocess.Popen([self.compiler_cmd, '-print-search-dirs'],
-                                    stdout=subprocess.PIPE)
-            o, e = proc.communicate()
-            libsearch = options.library_paths
-            for line in o.decode('ascii').splitlines():
-                if line.startswith('libraries: '):
-                    libsearch += line[len('libraries: '):].split(os.pathsep)
-
-        shlibs = []
-        not_resolved = []
-        for lib in libraries:
-            found = False
-            candidates = [
-                'lib%s.dll.a' % lib,
-                'lib%s.a' % lib,
-                '%s.dll.a' % lib,
-                '%s.a' % lib,
-                '%s.lib' % lib,
-            ]
-            for l in libsearch:
-                if found:
-                    break
-                if l.startswith('='):
-                    l = l[1:]
-                for c in candidates:
-                    if found:
-                        break
-                    implib = os.path.join(l, c)
-                    if os.path.exists(implib):
-                        if self.check_is_msvc():
-                            tmp_fd, tmp_filename = \
-                                tempfile.mkstemp(prefix='g-ir-win32-resolve-lib-')
-
-                            # This is dumb, but it is life... Windows does not like one
-                            # trying to write to a file when its FD is not closed first,
-                            # when we use a flag in a program to do so.  So, close,
-                            # write to temp file with dumpbin and *then* re-open the
-                            # file for reading.
-                            os.close(tmp_fd)
-                            output_flag = ['-out:' + tmp_filename]
-                            proc = subprocess.call(args + [implib] + output_flag,
-                                                   stdout=subprocess.PIPE)
-                            with open(tmp_filename, 'r', encoding='utf-8') as tmp_fileobj:
-                                for line in tmp_fileobj.read().splitlines():
-
-                                    if '__IMPORT_DESCRIPTOR_' in line:
-                                        line_tokens = line.split()
-                                        for item in line_tokens:
-                                            if item.startswith('__IMPORT_DESCRIPTOR_'):
-                                                shlibs.append(item[20:] + '.dll')
-                                                found = True
-                                                break
-                            tmp_fileobj.close()
-                            os.unlink(tmp_filename)
-                        else:
-                            proc = subprocess.Popen(args + [implib],
-                                                    stdout=subprocess.PIPE)
-                            o, e = proc.communicate()
-                            for line in o.decode('ascii').splitlines():
-                                shlibs.append(line)
-                                found = True
-                                break
-            if not found:
-                not_resolved.append(lib)
+            # The search dirs of the compiler don't change, so only ask once
+            if self._compiler_libsearch is None:
+                self._compiler_libsearch = []
+                with subprocess.Popen([self.compiler_cmd, '-print-search-dirs'],
+                                      stdout=subprocess.PIPE) as proc:
+                    for line in proc.stdout:
+                        line = line.decode('ascii').rstrip('\r\n')
+                        if line.startswith('libraries: '):
+                            self._compiler_libsearch += line[len('libraries: '):].split(os.pathsep)
+                            break
+            libsearch = options.library_paths + self._compiler_libsearch
+
+        # List each search directory once up front, rather than checking
+        # every candidate filename of every library for existence.
+        search_dirs = []
+        for l in libsearch:
+            if l.startswith('='):
+                l = l[1:]
+            search_dirs.append((l, self._get_dir_entries(l)))
+
+        # Probing each library spawns a process, so do that in parallel
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            results = list(executor.map(
+                lambda lib: self._resolve_windows_lib(lib, search_dirs, args),
+                libraries))
+
+        shlibs = [shlib for shlib in results if shlib is not None]
+        not_resolved = [lib for lib, shlib in zip(libraries, results)
+                        if shlib is None]
         if len(not_resolved) > 0:
             raise SystemExit(
                 "ERROR: can't resolve libraries to shared libraries: " +
@@ -425,9 +406,69 @@ class CCompiler(object):
             return self.compiler.linker_exe
 
     def check_is_msvc(self):
-        return isinstance(self.compiler, MSVCCompiler)
+        return self._is_msvc
 
     # Private APIs
+    def _get_dir_entries(self, directory):
+        try:
+            return self._dir_entries[directory]
+        except KeyError:
+            pass
+        try:
+            with os.scandir(directory or os.curdir) as it:
+                # normcase() makes the lookup case-insensitive on Windows,
+                # just like the filesystem.
+                entries = set(os.path.normcase(entry.name) for entry in it)
+        except OSError:
+            entries = set()
+        self._dir_entries[directory] = entries
+        return entries
+
+    def _resolve_windows_lib(self, lib, search_dirs, args):
+        candidates = [
+            'lib%s.dll.a' % lib,
+            'lib%s.a' % lib,
+            '%s.dll.a' % lib,
+            '%s.a' % lib,
+            '%s.lib' % lib,
+        ]
+        for l, entries in search_dirs:
+            for c in candidates:
+                if os.path.normcase(c) not in entries:
+                    continue
+                implib = os.path.join(l, c)
+                if self.check_is_msvc():
+                    tmp_fd, tmp_filename = \
+                        tempfile.mkstemp(prefix='g-ir-win32-resolve-lib-')
+
+                    # This is dumb, but it is life... Windows does not like one
+                    # trying to write to a file when its FD is not closed first,
+                    # when we use a flag in a program to do so.  So, close,
+                    # write to temp file with dumpbin and *then* re-open the
+                    # file for reading.
+                    os.close(tmp_fd)
+                    output_flag = ['-out:' + tmp_filename]
+                    subprocess.call(args + [implib] + output_flag,
+                                    stdout=subprocess.PIPE)
+                    match = None
+                    with open(tmp_filename, 'r', encoding='utf-8') as tmp_fileobj:
+                        # Stop reading at the first import descriptor
+                        for line in tmp_fileobj:
+                            match = _IMPORT_DESCRIPTOR_RE.search(line)
+                            if match:
+                                break
+                    os.unlink(tmp_filename)
+                    if match:
+                        return match.group(1) + '.dll'
+                else:
+                    # Only the first line of output is of interest
+                    with subprocess.Popen(args + [implib],
+                                          stdout=subprocess.PIPE) as proc:
+                        line = proc.stdout.readline()
+                    if line:
+                        return line.decode('ascii').rstrip('\r\n')
+        return None
+
     def _set_cpp_options(self, options):
         includes = []
         macros = []
@@ -451,7 +492,7 @@ class CCompiler(object):
                     # macros for compiling using distutils
                     # get dropped for MSVC builds, so
                     # escape the escape character.
-                    if isinstance(self.compiler, MSVCCompiler):
+                    if self._is_msvc:
                         macro_value = macro_value.replace('\"', '\\\"')
                 macros.append((macro_name, macro_value))
             elif option.startswith('-U'):
@@ -20,6 +20,7 @@
 
 import os
 import distutils
+import distutils.msvccompiler
 
 from distutils.errors import DistutilsExecError, CompileError
 from distutils.ccompiler import CCompiler, gen_preprocess_options
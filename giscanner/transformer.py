@@ -216,13 +216,14 @@ None."""
 
     def _parse_include(self, filename, uninstalled=False):
         parser = None
+        store_filename = None
         if self._cachestore is not None:
-            parser = self._cachestore.load(filename)
+            parser, store_filename = self._cachestore.load_or_path(filename)
         if parser is None:
             parser = GIRParser(types_only=not self._passthrough_mode)
             parser.parse(filename)
-            if self._cachestore is not None:
-                self._cachestore.store(filename, parser)
+            if store_filename is not None:
+                self._cachestore.store_at(store_filename, parser)
 
         for include in parser.get_namespace().includes:
             if include.name not in self._parsed_includes:
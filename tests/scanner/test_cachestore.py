@@ -0,0 +1,106 @@
+# GObject-Introspection - a framework for introspecting GObject libraries
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from giscanner.cachestore import CacheStore
+
+
+class TestCacheStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.old_environ = os.environ.copy()
+        os.environ['XDG_CACHE_HOME'] = os.path.join(self.tmpdir, 'cache')
+        os.environ.pop('GI_SCANNER_DISABLE_CACHE', None)
+        self.filename = os.path.join(self.tmpdir, 'Foo-1.0.gir')
+        with open(self.filename, 'w', encoding='utf-8') as f:
+            f.write('<repository/>')
+
+    def make_stale(self, store):
+        store_filename = store._get_filename(self.filename)
+        mtime = os.stat(self.filename).st_mtime - 10
+        os.utime(store_filename, (mtime, mtime))
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.old_environ)
+        shutil.rmtree(self.tmpdir)
+
+    def test_store_load(self):
+        data = {'foo': ['bar', 42]}
+        CacheStore().store(self.filename, data)
+        self.assertEqual(CacheStore().load(self.filename), data)
+
+    def test_store_load_large(self):
+        # Big enough to be loaded through mmap
+        data = ['foo%d' % i for i in range(10000)]
+        CacheStore().store(self.filename, data)
+        self.assertEqual(CacheStore().load(self.filename), data)
+
+    def test_bytes_filename(self):
+        CacheStore().store(self.filename.encode('utf-8'), 'data')
+        self.assertEqual(CacheStore().load(self.filename), 'data')
+
+    def test_load_or_path_store_at(self):
+        store = CacheStore()
+        data, store_filename = store.load_or_path(self.filename)
+        self.assertIsNone(data)
+        self.assertEqual(store_filename, store._get_filename(self.filename))
+        store.store_at(store_filename, 'data')
+        self.assertEqual(CacheStore().load_or_path(self.filename),
+                         ('data', store_filename))
+
+    def test_load_missing(self):
+        self.assertIsNone(CacheStore().load(self.filename))
+
+    def test_load_stale(self):
+        store = CacheStore()
+        store.store(self.filename, 'data')
+        self.make_stale(store)
+        self.assertIsNone(CacheStore().load(self.filename))
+
+    def test_store_overwrites_stale(self):
+        store = CacheStore()
+        store.store(self.filename, 'old')
+        self.make_stale(store)
+        store = CacheStore()
+        self.assertIsNone(store.load(self.filename))
+        store.store(self.filename, 'new')
+        self.assertEqual(CacheStore().load(self.filename), 'new')
+
+    def test_load_broken(self):
+        store = CacheStore()
+        store_filename = store._get_filename(self.filename)
+        with open(store_filename, 'wb') as f:
+            f.write(b'garbage')
+        self.assertIsNone(store.load(self.filename))
+        self.assertFalse(os.path.exists(store_filename))
+
+    def test_disabled(self):
+        os.environ['GI_SCANNER_DISABLE_CACHE'] = '1'
+        store = CacheStore()
+        store.store(self.filename, 'data')
+        self.assertIsNone(store.load(self.filename))
+        self.assertEqual(store.load_or_path(self.filename), (None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
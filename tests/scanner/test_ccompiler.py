@@ -15,9 +15,12 @@
 # Free Software Foundation, Inc., 59 Temple Place - Suite 330,
 # Boston, MA 02111-1307, USA.
 
+import argparse
 import distutils
 import os
 import shlex
+import shutil
+import tempfile
 import unittest
 from contextlib import contextmanager
 
@@ -218,6 +221,26 @@ class UnixCCompilerTest(unittest.TestCase):
                           '-Wno-deprecated-declarations'],
                          args)
 
+    def test_resolve_windows_libs(self):
+        """Checks that import libraries are found in the library paths."""
+        libdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, libdir)
+        for name in ['libfoo.dll.a', 'bar.lib']:
+            open(os.path.join(libdir, name), 'w').close()
+
+        # Make dlltool just print the import library it got passed
+        with Environ(dict(os.environ, DLLTOOL='echo')):
+            cc = CCompiler()
+            cc._compiler_libsearch = []
+            options = argparse.Namespace(nolibtool=True,
+                                         library_paths=['=' + libdir])
+            shlibs = cc.resolve_windows_libs(['foo', 'bar'], options)
+            self.assertEqual(['--identify ' + os.path.join(libdir, 'libfoo.dll.a'),
+                              '--identify ' + os.path.join(libdir, 'bar.lib')],
+                             shlibs)
+            with self.assertRaises(SystemExit):
+                cc.resolve_windows_libs(['foo', 'baz'], options)
+
 
 if __name__ == '__main__':
     unittest.main()